@@ -100,14 +100,8 @@ def sam(bamfile, outdir, prefix):
     bedcovu = 'samtools bedcov {outdir}/coverage/{prefix}_unmappedregions.bed {outdir}/coverage/{prefix}.sorted.bam > {outdir}/coverage/{prefix}_unmapcvg.tsv'.format(outdir = outdir, prefix = prefix)
     bedcovm = 'samtools bedcov {outdir}/coverage/{prefix}_mappedregions.bed {outdir}/coverage/{prefix}.sorted.bam > {outdir}/coverage/{prefix}_mapcvg.tsv'.format(outdir = outdir, prefix = prefix)
 
-    pipe1 = subprocess.Popen(sort, shell = True, stdout = subprocess.PIPE)
-    pipe1.wait()
-    pipe2 = subprocess.Popen(index, shell = True, stdin = pipe1.stdout, stdout = subprocess.PIPE)
-    pipe2.wait()
-    pipe3 = subprocess.Popen(bedcovu, shell = True, stdin = pipe2.stdout, stdout = subprocess.PIPE)
-    pipe3.wait()
-    pipe4 = subprocess.Popen(bedcovm, shell = True, stdin = pipe3.stdout, stdout = subprocess.PIPE)
-    pipe4.wait()
+    for cmd in (sort, index, bedcovu, bedcovm):
+        subprocess.run(cmd, shell = True, stdout = subprocess.DEVNULL)
 
 def output(outdir, prefix):
     """Writes the coverage statistics for each mapped and unmapped region to a result tsv file, and generates a boxplot (jpg) of the coverage for each region.
@@ -174,7 +168,7 @@ def cvg_main(mappedlocations, conflictlocations, bamfile, reference, outdir, pre
 
     """
     newpath = 'coverage'
-    os.makedirs(os.path.join(outdir,newpath))
+    os.makedirs(os.path.join(outdir,newpath), exist_ok = True)
     logging.info("Running coverage analysis (bed file generation, samfile analysis, saving files)")
     make_bed(mappedlocations, conflictlocations, reference, outdir, prefix)
     sam(bamfile, outdir, prefix)
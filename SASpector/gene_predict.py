@@ -33,8 +33,7 @@ def prokka(prefix, outdir):
     """
     logging.info("Starting annotation with prokka")
     cmd = 'prokka --outdir {outdir}/genesprediction --prefix {prefix}.predictedgenes {outdir}/{prefix}_unmappedregions.fasta'.format(prefix = prefix, outdir = outdir)
-    process = subprocess.Popen(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr = subprocess.STDOUT)
-    process.wait()
+    subprocess.run(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr = subprocess.STDOUT)
     logging.info("Annotation process completed")
             
 def blast(outdir, prefix, proteindb):
@@ -41,7 +41,7 @@ def kmer(k, prefix, outdir):
     """
     logging.info("Running k-mer analysis")    
     newpath = 'kmer'
-    os.makedirs(os.path.join(outdir,newpath))
+    os.makedirs(os.path.join(outdir,newpath), exist_ok = True)
     
     # Define the unmapped regions FASTA file
     unmap = '{outdir}/{prefix}_unmappedregions.fasta'.format(outdir = outdir, prefix = prefix)
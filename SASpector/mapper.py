@@ -18,6 +18,20 @@ second input file is the Illumina contigs FASTA file.
 
 """
 
+def _count_records(fasta, limit = None):
+    """ Counts the records of a FASTA file, scanning it in 1 MB blocks for header lines.
+        The scan stops as soon as limit records are found.
+    """
+    count = 0
+    previous = b'\n'
+    with open(fasta, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            count += (previous + block[:1]).count(b'\n>') + block.count(b'\n>')
+            if limit is not None and count >= limit:
+                break
+            previous = block[-1:]
+    return count
+
 def union(reference, prefix, out):
     """ Wraps union function from EMBOSS to check if reference is multifasta & combining
     
@@ -30,14 +44,14 @@ def union(reference, prefix, out):
     out : str
         Output directory  
     """
-    fasta_count = len([1 for line in open(reference) if line.startswith(">")])
-    logging.info("Your reference contains %i contigs. We are concatenating them into %s before pursuing" % (fasta_count, "{prefix}_concatenated.fasta".format(prefix=prefix)))
+    # Only tell single from multiple records apart, so the scan of a multifasta stops at its second record
+    fasta_count = _count_records(reference, limit = 2)
           
     if(fasta_count > 1):
+        logging.info("Your reference contains several contigs. We are concatenating them into %s before pursuing" % ("{prefix}_concatenated.fasta".format(prefix=prefix)))
         cmd = 'union -sequence {reference} -outseq {concatenated}'.format(
             reference = reference, concatenated = "{prefix}_concatenated.fasta".format(prefix=prefix))
-        process = subprocess.Popen(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr=subprocess.STDOUT)
-        process.wait()
+        subprocess.run(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr = subprocess.STDOUT, check = True)
         return True
     else:
         return False
@@ -61,16 +75,19 @@ def mauve(reference, contigs, prefix, out):
     logging.info("Starting whole genome alignment")
     cmd = 'progressiveMauve {reference} {contigs} --output={prefix}.alignment --backbone-output={prefix}.backbone'.format(
     reference = reference, contigs = contigs, prefix = prefix, out = out)
-    process = subprocess.Popen(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr=subprocess.STDOUT)
-    process.wait()
+    subprocess.run(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr = subprocess.STDOUT, check = True)
     
     newdir = 'alignment'
-    os.makedirs(os.path.join(out,newdir))
-    shutil.move('{prefix}.alignment'.format(prefix = prefix), '{out}/alignment/{prefix}.alignment'.format(prefix = prefix, out = out))
-    shutil.move('{prefix}.alignment.bbcols'.format(prefix = prefix), '{out}/alignment/{prefix}.alignment.bbcols'.format(out = out, prefix = prefix))
-    shutil.move('{prefix}.backbone'.format(prefix = prefix), '{out}/alignment/{prefix}.backbone'.format(out = out, prefix = prefix))
-    shutil.move('{reference}.sslist'.format(reference = reference), '{out}/alignment/{reference}.sslist'.format(out = out, reference = reference))
-    shutil.move('{contigs}.sslist'.format(contigs = contigs), '{out}/alignment/{contigs}.sslist'.format(out = out, contigs = contigs))
+    dest = os.path.join(out, newdir)
+    os.makedirs(dest, exist_ok = True)
+    outputs = ['{prefix}.alignment'.format(prefix = prefix), '{prefix}.alignment.bbcols'.format(prefix = prefix), '{prefix}.backbone'.format(prefix = prefix),
+               '{reference}.sslist'.format(reference = reference), '{contigs}.sslist'.format(contigs = contigs)]
+    for src in outputs:
+        try:
+            os.replace(src, os.path.join(dest, os.path.basename(src)))
+        except OSError:
+            # The sslist files sit next to the input FASTA files, possibly on another filesystem
+            shutil.move(src, os.path.join(dest, os.path.basename(src)))
 
     logging.info("Whole genome alignment completed!")
     
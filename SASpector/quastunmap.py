@@ -32,8 +32,7 @@ def quast(reference, outdir, prefix):
     logging.info("Running quast of draft genome against the reference")
     cmd = 'quast.py {outdir}/{prefix}_unmappedregions.fasta -r {reference} -o {outdir}/quast'.format(
         outdir = outdir, reference = reference, prefix = prefix)
-    process = subprocess.Popen(shlex.split(cmd), stdout = subprocess.PIPE)
-    process.wait()
+    subprocess.run(shlex.split(cmd), stdout = subprocess.DEVNULL)
     logging.info("QUAST completed")
     
 
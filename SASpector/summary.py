@@ -7,16 +7,44 @@ Created on Thu Nov 14 07:50:22 2019
 """
 
 from Bio import SeqUtils, SeqIO, BiopythonWarning
-from Bio.Seq import Seq
+from Bio.Data import CodonTable
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
+import csv
+import itertools
 import logging
+import mmap
 import os
+import sys
 import time
 import warnings
 
+def _import_numba():
+    """ Imports njit and prange from the optional numba package, (None, range) when it is not installed.
+        numba imports the coverage package, which our coverage module shadows when the SASpector directory is on
+        sys.path, so that directory and our module are hidden from the import and restored afterwards.
+    """
+    here = os.path.dirname(os.path.realpath(__file__))
+    path = list(sys.path)
+    previous = sys.modules.pop('coverage', None)
+    sys.path[:] = [p for p in path if os.path.realpath(p or os.curdir) != here]
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None, range
+    finally:
+        sys.path[:] = path
+        if previous is not None:
+            sys.modules['coverage'] = previous
+        else:
+            sys.modules.pop('coverage', None)
+    return njit, prange
+
+njit, prange = _import_numba()
 
 """ summary
 
@@ -26,6 +54,197 @@ sequence statistics such as length, GC content and amino acid residues frequency
 
 """
 
+# Amino acid residues reported in the unmapped regions summary, '*' being the stop codon
+AMINO_ACIDS = 'ADEGFLYCWPHQIMTNSKRV*'
+AMINO_COLUMNS = list(AMINO_ACIDS[:-1]) + ['Stop']
+_GC_CODES = np.frombuffer(b'GCSgcs', dtype = np.uint8)
+
+# IUPAC nucleotides encoded as 4-bit masks of the bases they stand for (A = 1, C = 2, G = 4, T = 8)
+_IUPAC_MASKS = {'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T', 'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT', 'K': 'GT',
+                'M': 'AC', 'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT'}
+_BASE_CODES = np.full(256, 15, dtype = np.uint16)
+for _code, _bases in _IUPAC_MASKS.items():
+    _BASE_CODES[[ord(_code), ord(_code.lower())]] = sum(1 << 'ACGT'.index(b) for b in _bases)
+
+def _codon_translations(table_id):
+    """ Builds the (4096, 2) table of the AMINO_ACIDS index of the residue encoded by a codon (three 4-bit base masks)
+        read on the forward strand and on the reverse complement strand, -1 when it encodes none of them.
+        Ambiguous codons translate only when all the codons they stand for encode the same residue, as in Bio.Seq.translate.
+    """
+    forward_table = CodonTable.unambiguous_dna_by_id[table_id].forward_table
+    
+    def translate(masks):
+        bases = [[b for i, b in enumerate('ACGT') if mask & (1 << i)] for mask in masks]
+        residues = {forward_table.get(''.join(codon), '*') for codon in itertools.product(*bases)}
+        return AMINO_ACIDS.index(residues.pop()) if len(residues) == 1 else -1
+    
+    def complement(mask):
+        return int('{:04b}'.format(mask)[::-1], 2)
+    
+    translations = np.full((4096, 2), -1, dtype = np.int64)
+    for masks in itertools.product(range(1, 16), repeat = 3):
+        codon = (masks[0] << 8) | (masks[1] << 4) | masks[2]
+        translations[codon] = translate(masks), translate([complement(m) for m in reversed(masks)])
+    return translations
+
+_CODON_TRANSLATIONS = _codon_translations(11)
+
+# Residues counted by each codon over both strands, as a (4096, 21) matrix
+_CODON_RESIDUES = np.zeros((4096, len(AMINO_ACIDS)), dtype = np.int64)
+for _strand in range(2):
+    _codons = np.flatnonzero(_CODON_TRANSLATIONS[:, _strand] >= 0)
+    _CODON_RESIDUES[_codons, _CODON_TRANSLATIONS[_codons, _strand]] += 1
+
+def _gc_content(counts, length):
+    """ GC content percentage (as Bio.SeqUtils.GC) from the occurrences of every byte value in a sequence """
+    return counts[_GC_CODES].sum()*100.0/length if length else 0.0
+
+def _region_composition(sequence):
+    """ Computes the GC content of a region and the residues frequency percentages over its six reading frames.
+        Every codon start of the forward strand belongs to exactly one of the three forward frames, and read
+        backwards it is also a codon of exactly one reverse complement frame, so the six translations are
+        counted from a single pass over the codons of the sequence.
+    """
+    bases = np.frombuffer(sequence.encode('ascii'), dtype = np.uint8)
+    codes = _BASE_CODES[bases]
+    codons = (codes[:-2] << 8) | (codes[1:-1] << 4) | codes[2:]
+    counts = np.bincount(codons, minlength = 4096) @ _CODON_RESIDUES
+    return _gc_content(np.bincount(bases, minlength = 256), len(bases)), counts*100.0/(2*len(codons))
+
+def _six_frame_kernel(bases, offsets, base_codes, codon_translations, gc_bases, residue_counts, gc_counts):
+    """ Compiled counterpart of _region_composition over all the regions concatenated in bases, region i spanning
+        bases[offsets[i]:offsets[i + 1]]. Fills the (21, N) residue counts and the (N,) GC base counts
+    """
+    for region in prange(len(offsets) - 1):
+        start = offsets[region]
+        end = offsets[region + 1]
+        for i in range(start, end):
+            gc_counts[region] += gc_bases[bases[i]]
+        for i in range(start, end - 2):
+            codon = (base_codes[bases[i]] << 8) | (base_codes[bases[i + 1]] << 4) | base_codes[bases[i + 2]]
+            for strand in range(2):
+                residue = codon_translations[codon, strand]
+                if residue >= 0:
+                    residue_counts[residue, region] += 1
+
+if njit is not None:
+    _six_frame_kernel = njit(parallel = True, cache = True)(_six_frame_kernel)
+
+def _compiled_composition(sequences):
+    """ Computes the GC content and the six frames residues frequency percentages of all regions with the compiled kernel """
+    lengths = np.fromiter(map(len, sequences), dtype = np.int64, count = len(sequences))
+    offsets = np.zeros(len(sequences) + 1, dtype = np.int64)
+    np.cumsum(lengths, out = offsets[1:])
+    bases = np.frombuffer(''.join(sequences).encode('ascii'), dtype = np.uint8)
+    gc_bases = np.zeros(256, dtype = np.int64)
+    gc_bases[_GC_CODES] = 1
+    
+    residue_counts = np.zeros((len(AMINO_ACIDS), len(sequences)), dtype = np.int64)
+    gc_counts = np.zeros(len(sequences), dtype = np.int64)
+    _six_frame_kernel(bases, offsets, _BASE_CODES.astype(np.int64), _CODON_TRANSLATIONS, gc_bases, residue_counts, gc_counts)
+    return gc_counts*100.0/lengths, residue_counts*100.0/(2*(lengths - 2))
+
+# Number of unmapped regions from which their composition is computed in a pool of processes
+PARALLEL_MIN_REGIONS = 256
+
+def _map_regions(function, sequences):
+    """ Applies function to every region sequence, spread over a process pool by chunks of 64 regions when there are many of them """
+    if len(sequences) < PARALLEL_MIN_REGIONS or (os.cpu_count() or 1) < 2:
+        return list(map(function, sequences))
+    with ProcessPoolExecutor() as executor:
+        return list(executor.map(function, sequences, chunksize = 64))
+
+# References from this size on are memory-mapped instead of being loaded as a string
+MMAP_THRESHOLD = 50*1024*1024
+
+class _MappedFasta:
+    """ Sequence of a single record FASTA file with a fixed line width, read from a read-only memory map of the file.
+        Slicing it as a string copies only the requested lines, with their newlines removed.
+    """
+    
+    def __init__(self, reference):
+        with open(reference, 'rb') as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access = mmap.ACCESS_READ)
+        self.supported = False
+        
+        # Locate the sequence lines after the header
+        header_end = self._map.find(b'\n')
+        if self._map[:1] != b'>' or header_end == -1 or self._map.find(b'>', header_end) != -1:
+            return
+        self._start = header_end + 1
+        end = len(self._map)
+        while end > self._start and self._map[end - 1] in b'\r\n\t ':
+            end -= 1
+        first_newline = self._map.find(b'\n', self._start, end)
+        if first_newline == -1:
+            self._newline = 1
+            self._width = max(end - self._start, 1)
+        else:
+            self._newline = 2 if self._map[first_newline - 1] == ord('\r') else 1
+            self._width = first_newline - self._start - self._newline + 1
+        if self._width < 1:
+            return
+        
+        # Check every line but the last one has the same width, and no line holds spaces or tabs that SeqIO would strip.
+        # The byte histogram is built over 1 MB blocks, as bincount widens its whole input to intp
+        stride = self._width + self._newline
+        self.byte_counts = np.zeros(256, dtype = np.int64)
+        newlines = 0
+        regular = True
+        for offset in range(self._start, end, 1 << 20):
+            block = np.frombuffer(self._map, dtype = np.uint8, count = min(1 << 20, end - offset), offset = offset)
+            self.byte_counts += np.bincount(block, minlength = 256)
+            line_ends = block[(stride - 1 - (offset - self._start)) % stride::stride]
+            regular = regular and bool((line_ends == ord('\n')).all())
+            newlines += len(line_ends)
+            del block, line_ends
+        if (not regular or self.byte_counts[ord('\n')] != newlines
+                or self.byte_counts[ord('\r')] != (newlines if self._newline == 2 else 0) or self.byte_counts[[ord(' '), ord('\t')]].any()):
+            return
+        self._length = end - self._start - self._newline*newlines
+        self.byte_counts[[ord('\r'), ord('\n')]] = 0
+        self.supported = True
+    
+    def __len__(self):
+        return self._length
+    
+    def _offset(self, position):
+        line, column = divmod(position, self._width)
+        return self._start + line*(self._width + self._newline) + column
+    
+    def __getitem__(self, region):
+        start, end, _ = region.indices(self._length)
+        if end <= start:
+            return ''
+        return self._map[self._offset(start):self._offset(end - 1) + 1].translate(None, b'\r\n').decode('ascii')
+
+def load_reference(reference):
+    """ Loads the sequence of the reference FASTA file. References larger than MMAP_THRESHOLD with a fixed line width
+        are memory-mapped, others are parsed with SeqIO
+    
+    Parameters
+    ----------
+    reference: str
+        The file location of the reference FASTA file
+    
+    Returns
+    -------
+    sequence: str or _MappedFasta
+        Sequence of the reference genome, sliced as a string
+    
+    """
+    if os.path.getsize(reference) >= MMAP_THRESHOLD:
+        sequence = _MappedFasta(reference)
+        if sequence.supported:
+            return sequence
+    return str(SeqIO.read(reference, format = 'fasta').seq)
+
+def _gc_count(sequence):
+    """ Number of G, C and S bases (either case) in the reference sequence, counted without copying it """
+    if isinstance(sequence, _MappedFasta):
+        return int(sequence.byte_counts[_GC_CODES].sum())
+    return sum(sequence.count(base) for base in 'GCSgcs')
+
 # Function to extract the coordinates from the backbone file
 
 def regions(prefix, out):
@@ -55,53 +274,45 @@ def regions(prefix, out):
     
     # Parse backbone file 
     coordinates = pd.read_csv(coordinates, sep = '\t')
+    seq0_left = coordinates.seq0_leftend.to_numpy()
+    seq0_right = coordinates.seq0_rightend.to_numpy()
+    seq1_left = coordinates.seq1_leftend.to_numpy()
+    seq1_right = coordinates.seq1_rightend.to_numpy()
+    aligned = (seq1_left > 0) & (seq1_right > 0)
 
     # Extract mapped regions coordinates
-    mappedlocations = coordinates[(coordinates.seq1_leftend > 0) & (coordinates.seq1_rightend > 0)]
-    mappedlocations = mappedlocations[['seq0_leftend','seq0_rightend']]
-    mappedlocations = mappedlocations[(mappedlocations.seq0_leftend > 0) & (mappedlocations.seq0_rightend > 0)]
+    mappedlocations = coordinates.loc[aligned & (seq0_left > 0) & (seq0_right > 0), ['seq0_leftend', 'seq0_rightend']]
 
     # Extract unmapped regions coordinates
-    unmappedlocations = coordinates[(coordinates.seq1_leftend == 0) & (coordinates.seq1_rightend == 0)]
-    unmappedlocations = unmappedlocations[['seq0_leftend', 'seq0_rightend']]
+    unmappedlocations = coordinates.loc[(seq1_left == 0) & (seq1_right == 0), ['seq0_leftend', 'seq0_rightend']]
 
     # Extract conflict regions coordinates
-    conflictlocations = coordinates[(coordinates.seq0_leftend == 0) & (coordinates.seq0_rightend == 0)]
-    conflictlocations = conflictlocations[['seq1_leftend', 'seq1_rightend']]
-    
-    # Extract mapped regions coordinates
-    mappedlocations = coordinates[(coordinates.seq1_leftend > 0) & (coordinates.seq1_rightend > 0)]
-    mappedlocations = mappedlocations[['seq0_leftend','seq0_rightend']]
-    mappedlocations = mappedlocations[(mappedlocations.seq0_leftend > 0) & (mappedlocations.seq0_rightend > 0)]
+    conflictlocations = coordinates.loc[(seq0_left == 0) & (seq0_right == 0), ['seq1_leftend', 'seq1_rightend']]
     
     # Extract reverse coordinates
-    reverselocations = coordinates[(coordinates.seq1_leftend > 0) & (coordinates.seq1_rightend > 0)]
-    reverselocations = reverselocations[['seq0_leftend','seq0_rightend']]
-    reverselocations = reverselocations[(reverselocations.seq0_leftend < 0) & (reverselocations.seq0_rightend < 0)]
+    reverselocations = coordinates.loc[aligned & (seq0_left < 0) & (seq0_right < 0), ['seq0_leftend', 'seq0_rightend']]
     
     return mappedlocations, unmappedlocations, conflictlocations, reverselocations
     
 # Function to extract the regions (+ flanks) from the reference and store them in dictionaries
 
-def refextract(reference, mappedlocations, unmappedlocations, conflictlocations, prefix, flanking):
-    """ Extracts the regions from the reference FASTA file
+def refextract(sequence, mappedlocations, unmappedlocations, conflictlocations, prefix, flanking):
+    """ Extracts the regions from the reference sequence
     
     Parameters
     ----------
-    reference: str
-        The file location of the reference FASTA file
+    sequence: str or _MappedFasta
+        Sequence of the reference genome
     prefix: str
         Name of the genome
     flanking: int
         Length of flanking regions [Default = 0 bp]
-    mappedlocations: dataframe
-        Coordinates of the mapped regions in the reference sequence
-    unmappedlocations: dataframe
-        Coordinates of the unmapped regions in the reference sequence
-    conflictlocations: dataframe
-        Coordinates of the conflict regions in the reference sequence
-    reverselocations: dataframe
-        Coordinates of the mapped reverse complement regions in the reference sequence
+    mappedlocations: ndarray
+        Coordinates (N, 2) of the mapped regions in the reference sequence
+    unmappedlocations: ndarray
+        Coordinates (N, 2) of the unmapped regions in the reference sequence
+    conflictlocations: ndarray
+        Coordinates (N, 2) of the conflict regions in the reference sequence
     
     Returns
     -------
@@ -110,70 +321,31 @@ def refextract(reference, mappedlocations, unmappedlocations, conflictlocations,
     unmappeddict: dict
         Dictionary of the coordinates and sequences of the unmapped regions
     idunmap: list
-        List of the coordinates of all unmapped regions as strings
+        List of the coordinates of all unmapped regions as strings, in the order of unmappeddict
     conflictdict: dict
         Dictionary of the coordinates and sequences of the conflict regions
     
     """
-    # Parse reference FASTA file
-    read = SeqIO.read(reference, format = 'fasta')
-        
     # Extract mapped regions and store in a dictionary
     mappeddict = dict()
-    idmap = list()
-    
-    for i in range(0, mappedlocations.shape[0]):
-        start = mappedlocations.iloc[i,0]
-        end = mappedlocations.iloc[i,1]
-        mappeddict[i] = str(read.seq[start:end])
-    
-    for i in range(0, mappedlocations.shape[0]):
-        start = mappedlocations.iloc[i,0]
-        end = mappedlocations.iloc[i,1]
-        header = (str(prefix), '_',str(start), ':', str(end))
-        idmap.append(''.join(header))
-    
-    for i in range(0, len(mappeddict)):
-        mappeddict[idmap[i]] = mappeddict.pop(i)
+    for start, end in mappedlocations:
+        mappeddict[f'{prefix}_{start}:{end}'] = sequence[start:end]
      
-    # Extract unmapped regions and store in a dictionary
+    # Extract unmapped regions (+ flanks) longer than 100 bp and store in a dictionary
     unmappeddict = dict()
-    idunmap = list()
+    for start, end in unmappedlocations:
+        start, end = start - flanking, end + flanking
+        region = sequence[start:end]
+        if len(region) > 100:
+            unmappeddict[f'{prefix}_{start}:{end}'] = region
     
-    for i in range(0, unmappedlocations.shape[0]):
-        start = unmappedlocations.iloc[i,0]
-        end = unmappedlocations.iloc[i,1]
-        if len(str(read.seq[start-flanking:end+flanking])) > 100:
-            unmappeddict[i] = str(read.seq[start-flanking:end+flanking])
-    unmappeddict = {i: v for i, v in enumerate(unmappeddict.values())}
-    
-    for i in range(0, unmappedlocations.shape[0]):
-        start = unmappedlocations.iloc[i,0]
-        end = unmappedlocations.iloc[i,1]
-        if len(str(read.seq[start-flanking:end+flanking])) > 100:
-            header = (str(prefix),'_', str(start-flanking), ':', str(end+flanking))
-            idunmap.append(''.join(header))
-
-    for i in range(0, len(unmappeddict)):
-        unmappeddict[idunmap[i]] = unmappeddict.pop(i)
+    # Regions sharing the same coordinates are stored once, so take the identifiers from the dictionary itself
+    idunmap = list(unmappeddict)
     
     # Extract conflict regions and store in a dictionary
     conflictdict = dict()
-    idconflict = list()
-    
-    for i in range(0, conflictlocations.shape[0]):
-       start = conflictlocations.iloc[i,0]
-       end = conflictlocations.iloc[i,1]
-       conflictdict[i] = str(read.seq[start:end])
-    
-    for i in range(0, conflictlocations.shape[0]):
-        start = conflictlocations.iloc[i,0]
-        end = conflictlocations.iloc[i,1]
-        header = (str(prefix), '_', str(start), ':', str(end))
-        idconflict.append(''.join(header))
-
-    for i in range(0, len(conflictdict)):
-        conflictdict[idconflict[i]] = conflictdict.pop(i)
+    for start, end in conflictlocations:
+        conflictdict[f'{prefix}_{start}:{end}'] = sequence[start:end]
     
 
     return mappeddict, unmappeddict, idunmap, conflictdict
@@ -195,142 +367,45 @@ def unmapsum(unmappeddict, idunmap):
     
     """
     
-    # Create GC content, length and amino acid residues list to store values for each unmapped region
-    gc_unmap = list()
-    len_unmap = list()
-    amino = pd.DataFrame(columns = ['A', 'D','E', 'G','F', 'L', 'Y', 'C', 'W', 'P', 'H', 'Q','I', 'M', 'T', 'N', 'S', 'K', 'R', 'V'])
-    
-    # Calculate values for each unmapped sequence
-    for seq in unmappeddict.values():
-        gc_unmap.append(SeqUtils.GC(str(seq)))
-        len_unmap.append(len(seq))
-        dna = Seq(seq)
-        dna_seq = [dna, dna.reverse_complement()]
-        codes = list()
-        for s in dna_seq:
-            for frame in range(3):
-                pro = s[frame:].translate(table = 11)
-                codes.append(pro._data)
-                
-        A = 0
-        D = 0
-        E = 0
-        G = 0
-        F = 0
-        L = 0
-        Y = 0
-        C = 0
-        W = 0
-        P = 0
-        H = 0
-        Q = 0
-        I = 0
-        M = 0
-        T = 0
-        N = 0
-        S = 0
-        K = 0
-        R = 0
-        V = 0
-        Stop = 0
-        len_seq = 0
-            
-        for pro_seq in codes:
-                
-            # Counts
-            A = (str(pro_seq).count('A')) + A
-            D = (str(pro_seq).count('D')) + D
-            E = (str(pro_seq).count('E')) + E
-            G = (str(pro_seq).count('G')) + G
-            F = (str(pro_seq).count('F')) + F
-            L = (str(pro_seq).count('L')) + L
-            Y = (str(pro_seq).count('Y')) + Y
-            C = (str(pro_seq).count('C')) + C
-            W = (str(pro_seq).count('W')) + W
-            P = (str(pro_seq).count('P')) + P
-            H = (str(pro_seq).count('H')) + H
-            Q = (str(pro_seq).count('Q')) + Q
-            I = (str(pro_seq).count('I')) + I
-            M = (str(pro_seq).count('M')) + M
-            T = (str(pro_seq).count('T')) + T
-            N = (str(pro_seq).count('N')) + N
-            S = (str(pro_seq).count('S')) + S
-            K = (str(pro_seq).count('K')) + K
-            R = (str(pro_seq).count('R')) + R
-            V = (str(pro_seq).count('V')) + V
-            Stop = (str(pro_seq).count('*')) + Stop
-            len_seq = len(pro_seq) + len_seq
-        
-        A = A/len_seq
-        D = D/len_seq
-        E = E/len_seq
-        G = G/len_seq
-        F = F/len_seq
-        L = L/len_seq
-        Y = Y/len_seq
-        C = C/len_seq
-        W = W/len_seq
-        P = P/len_seq
-        H = H/len_seq
-        Q = Q/len_seq
-        I = I/len_seq
-        M = M/len_seq
-        T = T/len_seq
-        N = N/len_seq
-        S = S/len_seq
-        K = K/len_seq
-        R = R/len_seq
-        V = V/len_seq
-        Stop = Stop/len_seq
-        
-        amino = amino.append({'A':A*100,
-                          'D':D*100,
-                          'E':E*100,
-                          'G':G*100,
-                          'F':F*100,
-                          'L':L*100,
-                          'Y':Y*100,
-                          'C':C*100,
-                          'W':W*100,
-                          'P':P*100,
-                          'H':H*100,
-                          'Q':Q*100,
-                          'I':I*100,
-                          'M':M*100,
-                          'T':T*100,
-                          'N':N*100,
-                          'S':S*100,
-                          'K':K*100,
-                          'R':R*100,
-                          'V':V*100,
-                          'Stop':Stop*100}, ignore_index = True)
-    codes.clear()
+    sequences = list(unmappeddict.values())
+    len_unmap = [len(seq) for seq in sequences]
+    
+    # Calculate GC content and amino acid residues for each unmapped sequence, with the compiled kernel when numba is available.
+    # Residues are stored one row per residue so that every column of the summary is contiguous
+    if njit is not None and sequences:
+        gc_unmap, amino = _compiled_composition(sequences)
+    else:
+        gc_unmap = np.empty(len(sequences), dtype = np.float64)
+        amino = np.empty((len(AMINO_ACIDS), len(sequences)), dtype = np.float64)
+        for i, (gc, residues) in enumerate(_map_regions(_region_composition, sequences)):
+            gc_unmap[i], amino[:, i] = gc, residues
                 
     
     # Create unmapped region summary dataframe: Region, GC content, length and total amino acid frequency for all six reading frames 
-    unmap_stats = pd.DataFrame(list(zip(idunmap, gc_unmap, len_unmap)), columns = ['Region', 'GCContent', 'Length'])
-    unmap_stats = pd.concat([unmap_stats, amino], axis = 1)
+    columns = {'Region': idunmap, 'GCContent': gc_unmap, 'Length': len_unmap}
+    columns.update(zip(AMINO_COLUMNS, amino))
+    unmap_stats = pd.DataFrame(columns)
     unmap_stats.reset_index(drop = True, inplace = True)
     unmap_stats.sort_index(inplace = True)
     
     return unmap_stats
 
-def refstats(reference, mappedlocations, unmappedlocations, conflictlocations, reverselocations, unmappeddict):
+def refstats(sequence, mappedlocations, unmappedlocations, conflictlocations, reverselocations, unmappeddict):
     """Generates summary statistics for reference genome based on the mapped, unmapped and conflict regions
     
     Parameters
     ----------
-    reference: str
-        The file location of the reference FASTA file
-    mappedlocations: dataframe
-        Coordinates of the mapped regions in the reference sequence
-    unmappedlocations: dataframe
-         Coordinates of the unmapped regions in the reference sequence
-    conflictlocations: dataframe
-        Coordinates of the conflict regions in the reference sequence
-    reverselocations: dataframe
-        Coordinates of the mapped reverse complement regions in the reference sequence
-    unmappeddict: dataframe
+    sequence: str or _MappedFasta
+        Sequence of the reference genome
+    mappedlocations: ndarray
+        Coordinates (N, 2) of the mapped regions in the reference sequence
+    unmappedlocations: ndarray
+        Coordinates (N, 2) of the unmapped regions in the reference sequence
+    conflictlocations: ndarray
+        Coordinates (N, 2) of the conflict regions in the reference sequence
+    reverselocations: ndarray
+        Coordinates (N, 2) of the mapped reverse complement regions in the reference sequence
+    unmappeddict: dict
         Dictionary of the coordinates and sequences of the unmapped regions
     
     Returns
@@ -341,33 +416,21 @@ def refstats(reference, mappedlocations, unmappedlocations, conflictlocations, r
         
     """
     # Calculate genome fraction
-    sum_map = 0
-    for i in range(0, mappedlocations.shape[0]):
-        sum_map = sum_map + abs(mappedlocations.iloc[i,1] - mappedlocations.iloc[i,0])
-    
-    sum_confl = 0
-    for i in range(0, conflictlocations.shape[0]):
-        sum_confl = sum_confl + abs(conflictlocations.iloc[i,1] - conflictlocations.iloc[i,0])
-        
-    sum_rev = 0
-    for i in range(0, reverselocations.shape[0]):
-        sum_rev = sum_rev + abs(reverselocations.iloc[i,1] - reverselocations.iloc[i,0])
-        
+    sum_map = int(np.abs(mappedlocations[:,1] - mappedlocations[:,0]).sum())
+    sum_confl = int(np.abs(conflictlocations[:,1] - conflictlocations[:,0]).sum())
+    sum_rev = int(np.abs(reverselocations[:,1] - reverselocations[:,0]).sum())
     total_map = sum_map + sum_confl + sum_rev
     
-    sum_unmap = 0
-    for i in range(0, unmappedlocations.shape[0]):
-        sum_unmap = sum_unmap + abs(unmappedlocations.iloc[i,1] - unmappedlocations.iloc[i,0])
+    sum_unmap = int(np.abs(unmappedlocations[:,1] - unmappedlocations[:,0]).sum())
     
-    read = SeqIO.read(reference, format = 'fasta')
-    refstats_dict = dict()
-    refstats_dict = [{'GCContent': SeqUtils.GC(read.seq),
-                     'Length': len(str(read.seq)),
+    length = len(sequence)
+    refstats_dict = [{'GCContent': _gc_count(sequence)*100.0/length if length else 0.0,
+                     'Length': length,
                      'NumberMappedRegions': mappedlocations.shape[0] + reverselocations.shape[0] + conflictlocations.shape[0],
                      'NumberUnmappedRegions': unmappedlocations.shape[0],
                      'FilteredUnmappedRegions': len(unmappeddict),
-                     'FractionMapped': (total_map/len(str(read.seq)))*100,
-                     'FractionUnmapped': (sum_unmap/len(str(read.seq)))*100}]
+                     'FractionMapped': (total_map/length)*100,
+                     'FractionUnmapped': (sum_unmap/length)*100}]
     
     # Create reference summary dataframe
     refstats_t = pd.DataFrame.from_dict(refstats_dict)
@@ -376,6 +439,13 @@ def refstats(reference, mappedlocations, unmappedlocations, conflictlocations, r
     
     return refstats_t
         
+def _write_tsv(path, table):
+    """ Writes a summary table with its header to a tab separated file, as DataFrame.to_csv without the index """
+    with open(path, 'w', newline = '', buffering = 1 << 20) as tsv:
+        writer = csv.writer(tsv, delimiter = '\t', lineterminator = '\n')
+        writer.writerow(table.columns)
+        writer.writerows(table.itertuples(index = False, name = None))
+        
 def output(mappeddict, unmappeddict, conflictdict, refstats, unmap_stats, prefix, out):
     """Generates the FASTA files and summary tables (csv files) for the mapped regions, missing regions and conflict regions
     
@@ -399,23 +469,20 @@ def output(mappeddict, unmappeddict, conflictdict, refstats, unmap_stats, prefix
     """
     
     path_sum = '{out}'.format(out = out)
-    refstats.to_csv(os.path.join(path_sum,'{genome_id}_referencesummary.tsv'.format(genome_id = prefix)), sep = '\t', index = False)
-    unmap_stats.to_csv(os.path.join(path_sum,'{genome_id}_unmapsummary.tsv'.format(genome_id = prefix)), sep = '\t', index = False)
+    _write_tsv(os.path.join(path_sum,'{genome_id}_referencesummary.tsv'.format(genome_id = prefix)), refstats)
+    _write_tsv(os.path.join(path_sum,'{genome_id}_unmapsummary.tsv'.format(genome_id = prefix)), unmap_stats)
     
     # Write mapped regions FASTA file
-    with open(os.path.join(out,'{prefix}_mappedregions.fasta'.format(prefix = prefix)), 'w+') as fasta:
-        for key, value in mappeddict.items():
-            fasta.write('>' + key + '\n' + value + '\n')
+    with open(os.path.join(out,'{prefix}_mappedregions.fasta'.format(prefix = prefix)), 'w', buffering = 1 << 20) as fasta:
+        fasta.writelines(f'>{key}\n{value}\n' for key, value in mappeddict.items())
     
     # Write unmapped regions FASTA file
-    with open(os.path.join(out,'{prefix}_unmappedregions.fasta'.format(prefix = prefix)), 'w+') as fasta:
-        for key, value in unmappeddict.items():
-            fasta.write('>' + key + '\n' + value + '\n')
+    with open(os.path.join(out,'{prefix}_unmappedregions.fasta'.format(prefix = prefix)), 'w', buffering = 1 << 20) as fasta:
+        fasta.writelines(f'>{key}\n{value}\n' for key, value in unmappeddict.items())
     
-    # Write mapped regions FASTA file
-    with open(os.path.join(out,'{prefix}_conflictregions.fasta'.format(prefix = prefix)), 'w+') as fasta:
-        for key, value in conflictdict.items():
-            fasta.write('>' + key + '\n' + value + '\n')
+    # Write conflict regions FASTA file
+    with open(os.path.join(out,'{prefix}_conflictregions.fasta'.format(prefix = prefix)), 'w', buffering = 1 << 20) as fasta:
+        fasta.writelines(f'>{key}\n{value}\n' for key, value in conflictdict.items())
 
 def plot(unmappeddict, unmap_stats, out):
     """ Generates boxplot, distribution plots and join plots from the missing regions summary statistics.
@@ -505,9 +572,12 @@ def extract_main(reference, prefix, flanking, out):
     logging.info("Analysis of the whole genome alignment and extraction of regions of interest")
     warnings.simplefilter('ignore', BiopythonWarning)
     mappedlocations, unmappedlocations, conflictlocations, reverselocations = regions(prefix, out)
-    mappeddict, unmappeddict, idunmap, conflictdict = refextract(reference, mappedlocations, unmappedlocations, conflictlocations, prefix, flanking)
+    mapped, unmapped, conflict, reverse = (locations.to_numpy(dtype = np.int64) for locations in
+                                           (mappedlocations, unmappedlocations, conflictlocations, reverselocations))
+    sequence = load_reference(reference)
+    mappeddict, unmappeddict, idunmap, conflictdict = refextract(sequence, mapped, unmapped, conflict, prefix, flanking)
     unmap_stats = unmapsum(unmappeddict, idunmap)
-    refstats_t = refstats(reference, mappedlocations, unmappedlocations, conflictlocations, reverselocations, unmappeddict)
+    refstats_t = refstats(sequence, mapped, unmapped, conflict, reverse, unmappeddict)
     plot(unmappeddict, unmap_stats, out)
     time.sleep(0.02)
     output(mappeddict, unmappeddict, conflictdict, refstats_t, unmap_stats, prefix, out)
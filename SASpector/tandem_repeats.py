@@ -28,7 +28,7 @@ def trf(prefix,outdir):
     cmd = 'trf {outdir}/{prefix}_unmappedregions.fasta 2 5 7 80 10 50 2000'.format(prefix = prefix, outdir = outdir)
     process = subprocess.run(shlex.split(cmd), stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
     newdir = 'trf'
-    os.makedirs(os.path.join(outdir, newdir))
+    os.makedirs(os.path.join(outdir, newdir), exist_ok = True)
     dest = os.path.join(outdir,newdir)
     for html in glob.glob('*.html'):
         shutil.move(html,dest)
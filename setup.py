@@ -26,6 +26,9 @@ setuptools.setup(
         'sourmash',
         'numpy'
     ],
+    extras_require = {
+        'numba': ['numba']
+    },
     data_files = [('', ['SASpector/saspector_proteindb.fasta'])],
     scripts = ['SASpector/SASpector', 'SASpector/coverage.py', 'SASpector/gene_predict.py', 'SASpector/kmer.py', 'SASpector/quastunmap.py', 'SASpector/mapper.py', 'SASpector/summary.py', 'SASpector/tandem_repeats.py'],
     classifiers = [
@@ -36,6 +39,6 @@ setuptools.setup(
     ],
     include_package_data = True,
     zip_safe = False,
-    python_requires='>=3.4'
+    python_requires='>=3.6'
 
 )